@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
 import requests
-import networkx as nx
-import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.figure import Figure
+
+from core import (SPREAD_DEFAULT, STRING_COLUMNS, build_graph, compute_layout, get_kegg_genes, merge_geo,
+                  render_interactive_figure, render_network_png, submit_string_interactions, top_hubs)
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="NeuroMetabolic Validation v3.6", page_icon="🔬", layout="wide")
@@ -11,43 +13,11 @@ st.set_page_config(page_title="NeuroMetabolic Validation v3.6", page_icon="🔬"
 st.title("🔬 Clinical Validation & PPI Interactome")
 st.markdown("### Systems Biology Pipeline: Phase 3 (Interactome) & Phase 4 (Clinical Overlay)")
 
-# --- FUNCTIONS ---
-
-@st.cache_data
-def get_kegg_genes(pathway_id):
-    url = f"https://rest.kegg.jp/get/{pathway_id}"
-    response = requests.get(url)
-    genes = []
-    if response.status_code == 200:
-        lines = response.text.split('\n')
-        is_gene_section = False
-        for line in lines:
-            if line.startswith('GENE'):
-                is_gene_section = True
-                line = line.replace('GENE', '').strip()
-            elif line.startswith('COMPOUND') or line.startswith('REFERENCE'):
-                is_gene_section = False
-            if is_gene_section and line and ';' in line:
-                parts = line.split('; ')
-                id_sym = parts[0].split(None, 1)
-                if len(id_sym) >= 2:
-                    clean_symbol = id_sym[1].split(',')[0].strip().upper()
-                    genes.append({'Symbol': clean_symbol, 'Description': parts[1].strip()})
-    return pd.DataFrame(genes)
-
-def get_string_interactions(gene_list):
-    url = "https://string-db.org/api/json/network"
-    params = {"identifiers": "%0d".join(gene_list), "species": 9606, "caller_identity": "manuscript_v3"}
-    try:
-        response = requests.post(url, data=params)
-        data = response.json()
-        return data if isinstance(data, list) else []
-    except:
-        return []
-
 # --- SIDEBAR ---
 st.sidebar.header("🧬 Study Parameters")
 pathway_map = {"Alzheimer's": "hsa05010", "Huntington's": "hsa05016", "Parkinson's": "hsa05012", "Type II Diabetes": "hsa04930"}
+focus_map = {"hsa04930": "insulin signaling involvement and glucose homeostasis mechanisms",
+             "hsa05010": "mitochondrial ETC involvement and cytoskeletal stability mechanisms"}
 disease_choice = st.sidebar.selectbox("Target Pathology:", list(pathway_map.keys()))
 pathway_id = pathway_map[disease_choice]
 
@@ -56,92 +26,88 @@ uploaded_file = st.sidebar.file_uploader("Upload Patient Data (GEO CSV)")
 
 st.sidebar.header("⚙️ Network Rigor")
 confidence = st.sidebar.slider("STRING Confidence Threshold", 0, 1000, 400) 
-node_spread = st.sidebar.slider("Node Spacing (Layout Force)", 1.0, 10.0, 5.0)
+node_spread = st.sidebar.slider("Node Spacing (Layout Force)", 1.0, 10.0, SPREAD_DEFAULT)
 
 st.sidebar.header("🎨 Visualization Polish")
 label_mode = st.sidebar.radio("Show Labels for:", ["Hubs Only (Degree > 2)", "All Nodes", "None"])
+render_mode = st.sidebar.radio("Renderer:", ["Interactive (WebGL)", "Static (Publication)"])
 
 st.sidebar.info("💡 *Network topology reflects functional coupling and pathway co-occurrence, not direct molecular causality.*")
 
 # --- DATA PROCESSING ---
-df_kegg = get_kegg_genes(pathway_id)
+# reruns with unchanged inputs reuse this session's artifacts
+sig = (pathway_id, confidence, uploaded_file.file_id if uploaded_file else None)
+stored = st.session_state.get('pipeline')
+if stored is not None and stored[0] == sig:
+    artifacts = stored[1]
+else:
+    artifacts = None
+    try:
+        df_kegg = get_kegg_genes(pathway_id)
+    except requests.RequestException:
+        df_kegg = pd.DataFrame()
 
-if not df_kegg.empty:
-    gene_list = df_kegg['Symbol'].unique().tolist()[:50]
-    
-    with st.spinner('Calculating Interactome...'):
-        interactions = get_string_interactions(gene_list)
-    
-    if uploaded_file:
-        try:
-            geo_df = pd.read_csv(uploaded_file)
-            sym_col = [c for c in geo_df.columns if 'sym' in c.lower() or 'gene' in c.lower()][0]
-            fc_col = [c for c in geo_df.columns if 'fc' in c.lower() or 'log' in c.lower()][0]
-            
-            geo_df = geo_df.rename(columns={sym_col: 'Symbol', fc_col: 'LogFC'})
-            geo_df['Symbol'] = geo_df['Symbol'].astype(str).str.strip().str.upper()
-            geo_df['LogFC'] = pd.to_numeric(geo_df['LogFC'], errors='coerce').fillna(0)
-            
-            df_kegg = pd.merge(df_kegg, geo_df[['Symbol', 'LogFC']], on='Symbol', how='left')
-            df_kegg['LogFC'] = df_kegg['LogFC'].fillna(0)
-        except:
-            st.error("CSV Error: Please ensure columns for 'Symbol' and 'LogFC' exist.")
-            df_kegg['LogFC'] = 0
-    else:
-        df_kegg['LogFC'] = 0
-
-    # --- NETWORK CONSTRUCTION ---
-    G = nx.Graph()
-    for _, row in df_kegg.iterrows():
-        if row['Symbol'] in gene_list:
-            G.add_node(row['Symbol'], logfc=row['LogFC'])
-
-    edges_found = 0
-    if interactions:
-        for edge in interactions:
-            if edge['score'] >= (confidence / 1000):
-                n_a, n_b = edge['preferredName_A'].upper(), edge['preferredName_B'].upper()
-                if n_a in G.nodes() and n_b in G.nodes():
-                    G.add_edge(n_a, n_b)
-                    edges_found += 1
-
-    # --- NEW: ORPHAN FILTER ---
-    # This removes the grey dots in the corner that have no connections
-    isolated_nodes = list(nx.isolates(G))
-    G.remove_nodes_from(isolated_nodes)
+    if not df_kegg.empty:
+        gene_list = df_kegg['Symbol'].unique().tolist()[:50]
+        
+        # the STRING round-trip overlaps with the GEO merge below
+        string_future = submit_string_interactions(gene_list, confidence)
+        
+        csv_error = False
+        if uploaded_file:
+            try:
+                df_kegg = merge_geo(pathway_id, uploaded_file.getvalue())
+            except:
+                csv_error = True
+                df_kegg['LogFC'] = np.float32(0)
+        else:
+            df_kegg['LogFC'] = np.float32(0)
+
+        with st.spinner('Calculating Interactome...'):
+            raw_edges_df = string_future.result()
+        string_failed = raw_edges_df is None
+        if string_failed:
+            raw_edges_df = pd.DataFrame(columns=STRING_COLUMNS)
+
+        # --- NETWORK CONSTRUCTION ---
+        G, lfc_map, edges_found, degree = build_graph(df_kegg, raw_edges_df, gene_list, confidence)
+
+        node_colors = []
+        if G.number_of_nodes() > 0:
+            lfc = np.fromiter((lfc_map.get(n, 0.0) for n in G.nodes()), dtype=np.float32, count=G.number_of_nodes())
+            node_colors = np.where(lfc > 0.5, '#FF4B4B', np.where(lfc < -0.5, '#4B4BFF', '#D5D8DC')).tolist()
+
+        # failed fetches are not stored, so the next rerun retries them
+        artifacts = (gene_list, G, lfc_map, edges_found, node_colors, top_hubs(G, 6, degree), csv_error)
+        if not string_failed:
+            st.session_state['pipeline'] = (sig, artifacts)
+
+if artifacts is not None:
+    gene_list, G, lfc_map, edges_found, node_colors, hubs, csv_error = artifacts
+    if csv_error:
+        st.error("CSV Error: Please ensure columns for 'Symbol' and 'LogFC' exist.")
+    isolated_count = len(gene_list) - G.number_of_nodes()
 
     # --- MAIN VIEW ---
     col1, col2 = st.columns([3, 1])
 
     with col1:
         if G.number_of_nodes() > 0:
-            fig, ax = plt.subplots(figsize=(12, 10))
-            k_val = node_spread / np.sqrt(len(G.nodes()))
-            pos = nx.spring_layout(G, k=k_val, iterations=100, seed=42)
-            
-            node_colors = []
-            for node in G.nodes():
-                val = df_kegg.loc[df_kegg['Symbol'] == node, 'LogFC'].max()
-                if val > 0.5: node_colors.append('#FF4B4B')
-                elif val < -0.5: node_colors.append('#4B4BFF')
-                else: node_colors.append('#D5D8DC')
-
-            nx.draw_networkx_edges(G, pos, alpha=0.3, edge_color='grey')
-            nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=1300, edgecolors='white', linewidths=1.5)
-            
+            pos = compute_layout(tuple(G.nodes()), tuple(G.edges()), node_spread)
             labels = {n: n for n in G.nodes() if (label_mode == "All Nodes" or (label_mode == "Hubs Only (Degree > 2)" and G.degree(n) > 2))}
-            nx.draw_networkx_labels(G, pos, labels=labels, font_size=10, font_weight='bold')
-            plt.axis('off')
-            st.pyplot(fig)
+
+            if render_mode == "Interactive (WebGL)":
+                st.plotly_chart(render_interactive_figure(G, pos, node_colors, labels, lfc_map, node_spread))
+            else:
+                if 'network_fig' not in st.session_state:
+                    st.session_state['network_fig'] = Figure(figsize=(12, 10))
+                png = render_network_png(tuple(G.nodes()), tuple(G.edges()), tuple(node_colors), tuple(labels), node_spread,
+                                         _fig=st.session_state['network_fig'])
+                st.image(png, width='stretch')
         else:
             st.warning("No interactions found at this confidence level. Try lowering the threshold.")
         
-        if "Diabetes" in disease_choice:
-            focus_area = "insulin signaling involvement and glucose homeostasis mechanisms"
-        elif "Alzheimer" in disease_choice:
-            focus_area = "mitochondrial ETC involvement and cytoskeletal stability mechanisms"
-        else:
-            focus_area = "bioenergetic pathway vulnerability"
+        focus_area = focus_map.get(pathway_id, "bioenergetic pathway vulnerability")
 
         st.markdown(f"**Analysis Interpretation:** *Highlighted hubs represent high-connectivity genes emerging under STRING confidence ≥ {confidence/1000}; when expression data is available, nodes are additionally colored by differential regulation, suggesting **{focus_area}** as key drivers of pathology in {disease_choice}.*")
 
@@ -149,12 +115,10 @@ if not df_kegg.empty:
         st.subheader("Network Metrics")
         st.metric("Validated Edges", edges_found)
         st.metric("Total Nodes (Connected)", G.number_of_nodes())
-        st.write(f"*(Removed {len(isolated_nodes)} unconnected nodes)*")
+        st.write(f"*(Removed {isolated_count} unconnected nodes)*")
         st.write("---")
         st.write("**Top Centrality Hubs**")
-        degrees = dict(G.degree())
-        top_hubs = sorted(degrees.items(), key=lambda x: x[1], reverse=True)[:6]
-        for hub, deg in top_hubs:
+        for hub, deg in hubs:
             if deg > 0: st.write(f"• **{hub}**: {deg} interactions")
 
     # --- MANUSCRIPT TOOLS ---
@@ -163,7 +127,7 @@ if not df_kegg.empty:
     m_tab1, m_tab2 = st.tabs(["Figure Caption", "Methods Section"])
     
     with m_tab1:
-        hub_names = [h[0] for h in top_hubs[:3]]
+        hub_names = [h[0] for h in hubs[:3]]
         hub_str = " and ".join([", ".join(hub_names[:-1]), hub_names[-1]]) if len(hub_names) > 1 else "N/A"
         cap = (f"**Figure 1. Interactome topology of {disease_choice} disease.** "
                f"A protein–protein interaction network was constructed using STRING-DB (confidence ≥ {confidence/1000}) "
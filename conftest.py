@@ -0,0 +1 @@
+# keeps the repository root importable for tests/ (core.py lives at the top level)
@@ -0,0 +1,196 @@
+import io
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import streamlit as st
+import pandas as pd
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import networkx as nx
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+import plotly.graph_objects as go
+import numpy as np
+import orjson
+import igraph
+from scipy.sparse import csr_array
+
+# --- FUNCTIONS ---
+
+# shared by KEGG and STRING; responses are cached on disk for 7 days
+_SESSION = requests_cache.CachedSession(Path(__file__).with_name('.neuro_cache'), backend='sqlite',
+                                        expire_after=7*24*3600)
+_SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=Retry(
+    total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))))
+
+_KEGG_SECTION = re.compile(r'^GENE\s.*?(?=^\S)', re.S | re.M)
+# "<gene id>  <SYMBOL>[, aliases]; <description>[; ...]" per line of the GENE block
+_KEGG_GENE = re.compile(r'^(?:GENE)?[ \t]+\S+[ \t]+([^,;\s]+)[^;\n]*;[ \t]+(.*?)[ \t]*(?:; .*)?$', re.M)
+
+@st.cache_data
+def get_kegg_genes(pathway_id):
+    url = f"https://rest.kegg.jp/get/{pathway_id}"
+    response = _SESSION.get(url, timeout=10)
+    return _parse_kegg_genes(response.text if response.status_code == 200 else '')
+
+def _parse_kegg_genes(text):
+    section = _KEGG_SECTION.search(text)
+    if section is None:
+        return pd.DataFrame(columns=['Symbol', 'Description'])
+    genes = pd.DataFrame(_KEGG_GENE.findall(text, *section.span()), columns=['Symbol', 'Description'])
+    genes['Symbol'] = genes['Symbol'].str.upper()
+    return genes
+
+@st.cache_data(show_spinner=False)
+def merge_geo(pathway_id, file_bytes):
+    geo_df = pd.read_csv(io.BytesIO(file_bytes), usecols=lambda c: any(t in c.lower() for t in ('sym', 'gene', 'fc', 'log')))
+    sym_col = [c for c in geo_df.columns if 'sym' in c.lower() or 'gene' in c.lower()][0]
+    fc_col = [c for c in geo_df.columns if 'fc' in c.lower() or 'log' in c.lower()][0]
+
+    geo_df = geo_df.rename(columns={sym_col: 'Symbol', fc_col: 'LogFC'})
+    geo_df['Symbol'] = geo_df['Symbol'].astype(str).str.strip().str.upper()
+    geo_df['LogFC'] = pd.to_numeric(geo_df['LogFC'], errors='coerce').fillna(0).astype(np.float32)
+
+    # duplicate GEO symbols keep their largest fold change
+    df_kegg = get_kegg_genes(pathway_id)
+    df_kegg['LogFC'] = df_kegg['Symbol'].map(geo_df.groupby('Symbol')['LogFC'].max()).fillna(0).astype(np.float32)
+    return df_kegg
+
+STRING_COLUMNS = ['preferredName_A', 'preferredName_B', 'score']
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def _fetch_string_edges(genes, required_score):
+    url = "https://string-db.org/api/json/network"
+    params = {"identifiers": "\r".join(genes), "species": 9606, "required_score": required_score,
+              "network_type": "functional", "caller_identity": "manuscript_v3"}
+    response = _SESSION.get(url, params=params, timeout=15)
+    data = orjson.loads(response.content)
+    if not isinstance(data, list):
+        # STRING reports errors as a JSON object; raising keeps them out of the cache
+        raise ValueError(data)
+    edges = pd.DataFrame.from_records(data, columns=STRING_COLUMNS)
+    edges['preferredName_A'] = edges['preferredName_A'].str.upper()
+    edges['preferredName_B'] = edges['preferredName_B'].str.upper()
+    codes_a = pd.Categorical(edges['preferredName_A'], categories=genes).codes
+    codes_b = pd.Categorical(edges['preferredName_B'], categories=genes).codes
+    return edges[(codes_a >= 0) & (codes_b >= 0)]
+
+def get_string_interactions(gene_list, confidence):
+    # required_score is bucketed so nearby thresholds share one cached response
+    try:
+        return _fetch_string_edges(tuple(sorted(gene_list)), confidence // 100 * 100)
+    except:
+        return None
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+def submit_string_interactions(gene_list, confidence):
+    return _EXECUTOR.submit(get_string_interactions, gene_list, confidence)
+
+def build_graph(df_kegg, raw_edges_df, gene_list, confidence):
+    lfc_map = df_kegg.groupby('Symbol')['LogFC'].max().to_dict()
+    edges_df = raw_edges_df[raw_edges_df['score'] >= confidence / 1000]
+    if edges_df.empty:
+        return nx.Graph(), lfc_map, 0, np.zeros(0, dtype=np.intp)
+    gene_index = pd.Index(gene_list)
+    rows = gene_index.get_indexer(edges_df['preferredName_A'])
+    cols = gene_index.get_indexer(edges_df['preferredName_B'])
+    adj = csr_array((np.ones(len(edges_df)), (rows, cols)), shape=(len(gene_list), len(gene_list)))
+    adj = ((adj + adj.T) > 0).astype(np.int8)
+
+    # orphan filter: genes without a surviving edge are dropped
+    keep = np.flatnonzero(np.diff(adj.indptr) > 0)
+    names = gene_index[keep]
+    G = nx.Graph()
+    G.add_nodes_from((n, {'logfc': lfc_map.get(n, 0)}) for n in names)
+    rows, cols = adj[keep][:, keep].nonzero()
+    upper = rows < cols
+    G.add_edges_from(zip(names[rows[upper]], names[cols[upper]]))
+    # adjacency row lengths are the degrees, in G.nodes() order
+    return G, lfc_map, len(edges_df), np.diff(adj.indptr)[keep]
+
+def top_hubs(G, k, degree=None):
+    deg = degree if degree is not None else np.fromiter((d for _, d in G.degree()), int, G.number_of_nodes())
+    if len(deg) == 0:
+        return []
+    # stable sort keeps ties in graph order, like heapq.nlargest
+    cutoff = np.partition(deg, -k)[-k] if len(deg) > k else deg.min()
+    cand = np.flatnonzero(deg >= cutoff)
+    cand = cand[np.argsort(-deg[cand], kind='stable')][:k]
+    nodes = list(G.nodes())
+    return [(nodes[i], int(deg[i])) for i in cand]
+
+_IGRAPH_LOCK = threading.Lock()
+
+@st.cache_data(show_spinner=False)
+def _layout_coords(nodes, edges, seed):
+    n = len(nodes)
+    idx = {node: i for i, node in enumerate(nodes)}
+    ig = igraph.Graph(n=n, edges=[(idx[a], idx[b]) for a, b in edges])
+    x0 = np.random.default_rng(seed).random((n, 2))
+    # igraph's RNG is process-wide, so reseed and lay out under one lock
+    with _IGRAPH_LOCK:
+        igraph.set_random_number_generator(random.Random(seed))
+        xy = np.array(ig.layout_fruchterman_reingold(seed=x0.tolist()).coords)
+    return nx.rescale_layout(xy).astype(np.float32)
+
+# the default spread fills the view; lower values contract the layout, higher ones shrink the nodes
+SPREAD_DEFAULT = 5.0
+_VIEW_LIMIT = 1.2
+
+def compute_layout(nodes, edges, node_spread, seed=42):
+    scale = np.float32(min(node_spread / SPREAD_DEFAULT, 1.0))
+    return dict(zip(nodes, _layout_coords(nodes, edges, seed) * scale))
+
+def _node_scale(node_spread):
+    return min(SPREAD_DEFAULT / node_spread, 1.0)
+
+_LABEL_STYLE = dict(fontsize=10, fontweight='bold', ha='center', va='center', clip_on=True)
+
+def render_network_figure(nodes, edges, node_colors, labels, node_spread, fig=None):
+    pos = compute_layout(nodes, edges, node_spread)
+    if fig is None:
+        fig = Figure(figsize=(12, 10))
+    ax = fig.axes[0] if fig.axes else fig.subplots()
+    ax.clear()
+    xy = np.array([pos[n] for n in nodes], dtype=np.float32)
+    idx = {n: i for i, n in enumerate(nodes)}
+    segs = xy[np.array([(idx[a], idx[b]) for a, b in edges], dtype=np.intp).reshape(-1, 2)]
+    ax.add_collection(LineCollection(segs, colors='grey', alpha=0.3, linewidths=1.0, zorder=1))
+    ax.scatter(xy[:, 0], xy[:, 1], c=list(node_colors), s=1300 * _node_scale(node_spread)**2, edgecolors='white',
+               linewidths=1.5, zorder=2)
+    ax.set_xlim(-_VIEW_LIMIT, _VIEW_LIMIT)
+    ax.set_ylim(-_VIEW_LIMIT, _VIEW_LIMIT)
+    for n in labels:
+        ax.text(*pos[n], n, **_LABEL_STYLE)
+    ax.axis('off')
+    return fig
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def render_network_png(nodes, edges, node_colors, labels, node_spread, _fig=None):
+    # _fig is excluded from the cache key
+    buf = io.BytesIO()
+    render_network_figure(nodes, edges, node_colors, labels, node_spread, _fig).savefig(buf, format='png', dpi=110, bbox_inches='tight')
+    return buf.getvalue()
+
+def render_interactive_figure(G, pos, node_colors, labels, lfc_map, node_spread):
+    node_xy = np.array([pos[n] for n in G.nodes()])
+    edge_xy = np.full((3 * G.number_of_edges(), 2), np.nan, dtype=np.float32)
+    edge_xy[0::3] = [pos[a] for a, _ in G.edges()]
+    edge_xy[1::3] = [pos[b] for _, b in G.edges()]
+    fig = go.Figure([
+        go.Scattergl(x=edge_xy[:, 0], y=edge_xy[:, 1], mode='lines', opacity=0.3,
+                     line=dict(color='grey', width=1), hoverinfo='skip'),
+        go.Scattergl(x=node_xy[:, 0], y=node_xy[:, 1], mode='markers+text',
+                     text=[labels.get(n, '') for n in G.nodes()], textfont=dict(size=10),
+                     hovertext=[f"{n} (LogFC {lfc_map.get(n, 0):.2f}, degree {d})" for n, d in G.degree()],
+                     hoverinfo='text', marker=dict(color=node_colors, size=30 * _node_scale(node_spread),
+                                                   line=dict(color='white', width=1.5))),
+    ])
+    fig.update_layout(showlegend=False, height=800, margin=dict(l=0, r=0, t=0, b=0), plot_bgcolor='white',
+                      xaxis=dict(visible=False, range=[-_VIEW_LIMIT, _VIEW_LIMIT]),
+                      yaxis=dict(visible=False, range=[-_VIEW_LIMIT, _VIEW_LIMIT], scaleanchor='x'))
+    return fig
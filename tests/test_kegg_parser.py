@@ -0,0 +1,35 @@
+from core import _parse_kegg_genes
+
+KEGG_TEXT = """ENTRY       hsa05010                    Pathway
+NAME        Alzheimer disease - Homo sapiens (human)
+DRUG        D00001  Foo; bar
+GENE        351  APP; amyloid beta precursor protein [KO:K04520]
+            100532731  COX8C, COX8-2; cytochrome c oxidase subunit 8C [KO:K02273]
+            1234  abc; first; second
+            1235  XYZ, A1; desc ; tail
+            1236  Q; plain [KO:K1]   
+            1237  R; a;b
+            5555  NOSEMI no description
+COMPOUND    C00001  H2O; water
+REFERENCE   PMID:1
+  AUTHORS   Smith J; Doe A
+///
+"""
+
+
+def test_parses_gene_lines():
+    genes = _parse_kegg_genes(KEGG_TEXT)
+    assert list(zip(genes['Symbol'], genes['Description'])) == [
+        ('APP', 'amyloid beta precursor protein [KO:K04520]'),
+        ('COX8C', 'cytochrome c oxidase subunit 8C [KO:K02273]'),
+        ('ABC', 'first'),
+        ('XYZ', 'desc'),
+        ('Q', 'plain [KO:K1]'),
+        ('R', 'a;b'),
+    ]
+
+
+def test_missing_gene_section():
+    genes = _parse_kegg_genes("ENTRY       hsa00000\n///\n")
+    assert genes.empty
+    assert list(genes.columns) == ['Symbol', 'Description']